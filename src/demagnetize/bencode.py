@@ -1,4 +1,5 @@
 from __future__ import annotations
+import re
 from typing import Any, Optional
 import attr
 from .errors import UnbencodeError
@@ -22,21 +23,34 @@ def bencode(obj: Any) -> bytes:
         raise TypeError(f"Cannot bencode {type(obj).__name__}")
 
 
+# Byte values of the characters with special meaning in bencoded data
+_DICT, _LIST, _INT, _END, _COLON = b"dlie:"
+_DIGITS = frozenset(b"0123456789")
+#: A canonical bencoded integer: no leading zeros and no negative zero
+_INT_RE = re.compile(rb"0|-?[1-9][0-9]*")
+
+
 @attr.define
 class Unbencoder:
     buff: bytes
     index: int = 0
+    #: Dict keys seen so far in this input, so that the same key in many
+    #: dicts (e.g., a list of peer dicts) is stored as a single object
+    keys: dict[bytes, bytes] = attr.Factory(dict)
 
-    def getchar(self) -> bytes:
+    def getchar(self) -> int:
         if self.index < len(self.buff):
-            b = self.buff[self.index : self.index + 1]
+            c = self.buff[self.index]
             self.index += 1
-            return b
+            return c
         else:
             raise UnbencodeError("Short input")
 
-    def peek(self) -> bytes:
-        return self.buff[self.index : self.index + 1]
+    def peek(self) -> Optional[int]:
+        if self.index < len(self.buff):
+            return self.buff[self.index]
+        else:
+            return None
 
     def read_bytes(self, length: int) -> bytes:
         if self.index + length <= len(self.buff):
@@ -46,47 +60,47 @@ class Unbencoder:
         else:
             raise UnbencodeError("Short input")
 
-    def read_int(self, stop: bytes) -> int:
-        digits: list[bytes] = []
-        while (d := self.getchar()) != stop:
-            if not d.isdigit() and not (d == b"-" and not digits):
-                raise UnbencodeError("Non-digit in integer")
-            digits.append(d)
-        num = b"".join(digits).decode("us-ascii")
-        if not num or (num[0] == "0" and len(digits) > 1) or (num[0:2] == "-0"):
+    def read_int(self, stop: int) -> int:
+        m = _INT_RE.match(self.buff, self.index)
+        end = m.end() if m else self.index
+        if end >= len(self.buff):
+            raise UnbencodeError("Short input")
+        elif m is None or self.buff[end] != stop:
             raise UnbencodeError("Invalid bencoded integer")
-        return int(num, 10)
+        self.index = end + 1
+        return int(m[0])
 
     def get_trailing(self) -> bytes:
         return self.buff[self.index :]
 
     def decode_next(self) -> Any:
         c = self.getchar()
-        if c == b"d":
+        if c == _DICT:
             bdict: dict[bytes, Any] = {}
             prev_key: Optional[bytes] = None
-            while self.peek() != b"e":
+            while self.peek() != _END:
                 key = self.decode_next()
                 if not isinstance(key, bytes):
                     raise UnbencodeError("Non-bytes key in dict")
                 elif prev_key is not None and key <= prev_key:
                     raise UnbencodeError("Dict keys not in sorted order")
+                key = self.keys.setdefault(key, key)
                 value = self.decode_next()
                 bdict[key] = value
                 prev_key = key
             self.getchar()
             return bdict
-        elif c == b"l":
+        elif c == _LIST:
             blist: list = []
-            while self.peek() != b"e":
+            while self.peek() != _END:
                 blist.append(self.decode_next())
             self.getchar()
             return blist
-        elif c == b"i":
-            return self.read_int(b"e")
-        elif c.isdigit():
+        elif c == _INT:
+            return self.read_int(_END)
+        elif c in _DIGITS:
             self.index -= 1
-            length = self.read_int(b":")
+            length = self.read_int(_COLON)
             return self.read_bytes(length)
         else:
             raise UnbencodeError("Invalid byte in input")
@@ -24,12 +24,22 @@ MAX_PEER_MSG_LEN = 65535
 #: Size of BEP 9 "data" message payloads
 INFO_CHUNK_SIZE = 16 << 10
 
+#: Maximum info dictionary size (in bytes) to accept from a peer
+MAX_INFO_SIZE = 32 << 20
+
 #: Overall timeout for interacting with a tracker
 TRACKER_TIMEOUT = 30
 
 #: Timeout for sending & receiving a "stopped" announcement to a tracker
 TRACKER_STOP_TIMEOUT = 3
 
+#: Initial estimate of the round-trip time (in seconds) to a UDP tracker
+UDP_INITIAL_RTT = 0.5
+
+#: Minimum time (in seconds) to wait for a reply to the first transmission of
+#: a UDP tracker request
+UDP_MIN_TIMEOUT = 1.0
+
 #: Maximum number of peers to interact with at once for a single magnet
 PEERS_PER_MAGNET_LIMIT = 30
 
@@ -38,3 +48,9 @@ PEER_HANDSHAKE_TIMEOUT = 60
 
 #: Maximum number of magnet links to operate on at once in batch mode
 MAGNET_LIMIT = 50
+
+#: Maximum number of connections to HTTP trackers to have open at once
+HTTP_CONNECTION_LIMIT = 256
+
+#: Maximum number of idle HTTP tracker connections to keep alive for reuse
+HTTP_KEEPALIVE_LIMIT = 64
@@ -1,13 +1,22 @@
 from __future__ import annotations
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 from random import randint
 from time import time
+from typing import Optional
 from anyio import CapacityLimiter
 import attr
 import click
+from httpx import AsyncClient, Limits, Timeout
 from torf import Magnet, Torrent
 from torf._utils import decode_dict
-from .consts import CLIENT, MAGNET_LIMIT
+from .consts import (
+    CLIENT,
+    HTTP_CONNECTION_LIMIT,
+    HTTP_KEEPALIVE_LIMIT,
+    MAGNET_LIMIT,
+)
 from .errors import DemagnetizeError
 from .session import TorrentSession
 from .util import Key, Report, acollect, log, make_peer_id, template_torrent_filename
@@ -18,20 +27,61 @@ class Demagnetizer:
     key: Key = attr.Factory(Key.generate)
     peer_id: bytes = attr.Factory(make_peer_id)
     peer_port: int = attr.Factory(lambda: randint(1025, 65535))
+    #: HTTP client shared by all HTTP tracker sessions; only set while at
+    #: least one `http_client_scope()` is active
+    http_client: Optional[AsyncClient] = attr.field(
+        default=None, init=False, eq=False, repr=False
+    )
+    #: Number of currently-active `http_client_scope()`s
+    http_client_users: int = attr.field(default=0, init=False, eq=False, repr=False)
 
     def __attrs_post_init__(self) -> None:
+        if len(self.peer_id) > 20:
+            raise ValueError("Peer ID must be at most 20 bytes long")
         log.debug("Using key = %s", self.key)
         log.debug("Using peer ID = %r", self.peer_id)
         log.debug("Using peer port = %d", self.peer_port)
 
+    @asynccontextmanager
+    async def http_client_scope(self) -> AsyncIterator[AsyncClient]:
+        # All active scopes, whether nested or concurrent, share one client so
+        # that announces for all magnets in a batch use one connection pool.
+        # The client is closed when the last scope exits.
+        if self.http_client is None:
+            self.http_client = self.make_http_client()
+        client = self.http_client
+        self.http_client_users += 1
+        try:
+            yield client
+        finally:
+            self.http_client_users -= 1
+            if self.http_client_users == 0:
+                self.http_client = None
+                await client.aclose()
+
+    def make_http_client(self) -> AsyncClient:
+        return AsyncClient(
+            follow_redirects=True,
+            headers={"User-Agent": CLIENT},
+            limits=Limits(
+                max_connections=HTTP_CONNECTION_LIMIT,
+                max_keepalive_connections=HTTP_KEEPALIVE_LIMIT,
+            ),
+            # Announces may have to queue for a connection when many trackers
+            # are contacted at once; don't let that time out on its own, so
+            # that TRACKER_TIMEOUT remains the only overall limit.
+            timeout=Timeout(5.0, pool=None),
+        )
+
     async def download_torrent_info(
         self, magnets: list[Magnet], fntemplate: str
     ) -> Report:
         report = Report()
         coros = [self.demagnetize2file(m, fntemplate) for m in magnets]
-        async with acollect(coros, limit=CapacityLimiter(MAGNET_LIMIT)) as ait:
-            async for r in ait:
-                report += r
+        async with self.http_client_scope():
+            async with acollect(coros, limit=CapacityLimiter(MAGNET_LIMIT)) as ait:
+                async for r in ait:
+                    report += r
         return report
 
     async def demagnetize2file(self, magnet: Magnet, fntemplate: str) -> Report:
@@ -60,7 +110,8 @@ class Demagnetizer:
 
     async def demagnetize(self, magnet: Magnet) -> Torrent:
         session = self.open_session(magnet)
-        md = await session.get_info()
+        async with self.http_client_scope():
+            md = await session.get_info()
         return compose_torrent(magnet, md)
 
     def open_session(self, magnet: Magnet) -> TorrentSession:
@@ -28,7 +28,13 @@ from .messages import (
     encode_message,
 )
 from ..bencode import unbencode
-from ..consts import CLIENT, MAX_PEER_MSG_LEN, PEER_HANDSHAKE_TIMEOUT, UT_METADATA
+from ..consts import (
+    CLIENT,
+    MAX_INFO_SIZE,
+    MAX_PEER_MSG_LEN,
+    PEER_HANDSHAKE_TIMEOUT,
+    UT_METADATA,
+)
 from ..errors import PeerError, UnbencodeError
 from ..util import TRACE, InfoHash, InfoPiecer, log
 
@@ -219,6 +225,12 @@ async def get_metadata_info(conn: PeerConnection) -> dict:
         conn.error("Peer does not support metadata transfer")
     if handshake.metadata_size is None:
         conn.error("Peer did not report info size in extended handshake")
+    if not 0 < handshake.metadata_size <= MAX_INFO_SIZE:
+        # The info buffer is allocated up front, so don't let a peer make us
+        # allocate an absurd amount of memory
+        conn.error(
+            f"Peer declared invalid info size of {handshake.metadata_size} bytes"
+        )
     log.log(
         TRACE, "%s declares info size as %d bytes", conn.peer, handshake.metadata_size
     )
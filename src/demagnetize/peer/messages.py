@@ -3,9 +3,7 @@
 # happens.
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from collections import deque
-from functools import reduce
-from operator import or_
+from functools import cached_property
 import struct
 from typing import Any, ClassVar, Optional
 import attr
@@ -14,6 +12,12 @@ from ..bencode import bencode, partial_unbencode, unbencode
 from ..errors import UnbencodeError
 from ..util import InfoHash, get_string, get_typed_value
 
+#: Handshake layout: protocol header, reserved (extension) bits, info hash,
+#: peer ID.  The "20s" format NUL-pads a short peer ID.
+_HANDSHAKE = struct.Struct("!20sQ20s20s")
+#: Message prefix: length (including the type byte) and type
+_MSG_HEADER = struct.Struct("!IB")
+
 
 @attr.define(slots=False)
 class Handshake:
@@ -29,11 +33,12 @@ class Handshake:
         return f"handshake; extensions: {extensions}; peer_id: {self.peer_id!r}"
 
     def __bytes__(self) -> bytes:
-        return (
-            self.HEADER
-            + reduce(or_, [1 << i for i in self.extensions], 0).to_bytes(8, "big")
-            + bytes(self.info_hash)
-            + (self.peer_id + b"\0" * 20)[:20]
+        return _HANDSHAKE.pack(
+            self.HEADER,
+            # The bits are distinct, so summing them is the same as ORing them
+            sum(1 << i for i in self.extensions),
+            self.info_hash.as_bytes,
+            self.peer_id,
         )
 
     @classmethod
@@ -42,15 +47,16 @@ class Handshake:
             raise ValueError(
                 f"handshake wrong length; got {len(blob)} bytes, expected {cls.LENGTH}"
             )
-        if blob[: len(cls.HEADER)] != cls.HEADER:
+        header, exts, info_hash_bytes, peer_id = _HANDSHAKE.unpack(blob)
+        if header != cls.HEADER:
             raise ValueError("handshake had invalid protocol declaration")
-        offset = len(cls.HEADER)
-        exts = int.from_bytes(blob[offset : offset + 8], "big")
-        extensions = {i for i in range(64) if exts & (1 << i)}
-        offset += 8
-        info_hash = InfoHash.from_bytes(blob[offset : offset + 20])
-        offset += 20
-        peer_id = blob[offset:]
+        # Visit only the set bits rather than testing all 64
+        extensions: set[int] = set()
+        while exts:
+            low = exts & -exts
+            extensions.add(low.bit_length() - 1)
+            exts ^= low
+        info_hash = InfoHash.from_bytes(info_hash_bytes)
         return cls(extensions=extensions, info_hash=info_hash, peer_id=peer_id)
 
     @property
@@ -64,29 +70,40 @@ class Handshake:
         return extnames
 
 
+#: Mapping from message type IDs to the Message subclasses that implement them
+MESSAGE_TYPES: dict[int, type[Message]] = {}
+
+
 @attr.define(slots=False)
 class Message(ABC):
     TYPE: ClassVar[int]
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # Only register classes that define their own TYPE, skipping
+        # intermediate bases like EmptyMessage
+        if "TYPE" in cls.__dict__:
+            if (other := MESSAGE_TYPES.get(cls.TYPE)) is not None:
+                raise ValueError(
+                    f"Message type {cls.TYPE} is already implemented by"
+                    f" {other.__name__}"
+                )
+            MESSAGE_TYPES[cls.TYPE] = cls
+
     def __bytes__(self) -> bytes:
         payload = self.to_payload()
-        length = 1 + len(payload)
-        return length.to_bytes(4, "big") + bytes([self.TYPE]) + payload
+        return _MSG_HEADER.pack(1 + len(payload), self.TYPE) + payload
 
     @classmethod
     def parse(cls, blob: bytes) -> Message:
         # length = blob[:4]
         mtype = blob[4]
         payload = blob[5:]
-        klasses = deque(Message.__subclasses__())
-        while klasses:
-            klass = klasses.popleft()
-            if hasattr(klass, "TYPE"):
-                if klass.TYPE == mtype:
-                    return klass.from_payload(payload)
-            else:
-                klasses.extend(klass.__subclasses__())
-        raise ValueError(f"Unknown message type: {mtype}")
+        try:
+            klass = MESSAGE_TYPES[mtype]
+        except KeyError:
+            raise ValueError(f"Unknown message type: {mtype}")
+        return klass.from_payload(payload)
 
     @classmethod
     @abstractmethod
@@ -443,7 +460,7 @@ class ExtendedHandshake:
     def to_extended(self) -> Extended:
         return Extended(msg_id=0, payload=self.to_extended_payload())
 
-    @property
+    @cached_property
     def extension_names(self) -> list[str]:
         exts: list[str] = []
         for k in self.data[b"m"]:
@@ -455,11 +472,11 @@ class ExtendedHandshake:
     def extensions(self) -> BEP10Registry:
         return BEP10Registry.from_m(self.data[b"m"])
 
-    @property
+    @cached_property
     def client(self) -> Optional[str]:
         return get_string(self.data, b"v")
 
-    @property
+    @cached_property
     def metadata_size(self) -> Optional[int]:
         return get_typed_value(self.data, b"metadata_size", int)
 
@@ -531,10 +548,12 @@ class BEP9Message(ExtendedMessage):
         )
 
     def to_extended_payload(self) -> bytes:
-        data = {b"msg_type": self.msg_type, b"piece": self.piece}
+        # The dict always has the same shape, so fill in a template rather
+        # than going through bencode()
+        s = b"d8:msg_typei%de5:piecei%de" % (self.msg_type, self.piece)
         if self.total_size is not None:
-            data[b"total_size"] = self.total_size
-        return bencode(data) + self.payload
+            s += b"10:total_sizei%de" % (self.total_size,)
+        return s + b"e" + self.payload
 
 
 AnyMessage = Message | ExtendedHandshake | ExtendedMessage
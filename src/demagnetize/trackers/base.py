@@ -1,7 +1,8 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from enum import Enum
-from ipaddress import AddressValueError, IPv4Address, IPv6Address
+import logging
+from socket import AF_INET6, inet_ntoa, inet_ntop
 import struct
 from typing import TYPE_CHECKING, ClassVar
 from anyio import fail_after
@@ -17,6 +18,9 @@ from ..util import TRACE, InfoHash, log
 if TYPE_CHECKING:
     from ..core import Demagnetizer
 
+_PEER4 = struct.Struct("!4sH")
+_PEER6 = struct.Struct("!16sH")
+
 
 # NOTE: Avoid using slotted classes here, as combining them with attrs and
 # `__subclasses__` can lead to Heisenbugs depending on when garbage collection
@@ -57,12 +61,13 @@ class Tracker(ABC):
                         await conn.announce(info_hash, AnnounceEvent.STARTED)
                     ).peers
                     log.info("%s returned %d peers for %s", self, len(peers), info_hash)
-                    log.debug(
-                        "%s returned peers for %s: %s",
-                        self,
-                        info_hash,
-                        ", ".join(map(str, peers)) or "<none>",
-                    )
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug(
+                            "%s returned peers for %s: %s",
+                            self,
+                            info_hash,
+                            ", ".join(map(str, peers)) or "<none>",
+                        )
                     for p in peers:
                         await sender.send(p)
                     with fail_after(TRACKER_STOP_TIMEOUT, shield=True):
@@ -124,23 +129,21 @@ class AnnounceResponse:
     peers: list[Peer]
 
 
-def unpack_peers(data: bytes) -> list[Peer]:
-    peers: list[Peer] = []
+def unpack_peers(data: bytes, offset: int = 0) -> list[Peer]:
     try:
-        for ipnum, port in struct.iter_unpack("!IH", data):
-            ip = str(IPv4Address(ipnum))
-            peers.append(Peer(host=ip, port=port))
-    except (struct.error, AddressValueError):
+        return [
+            Peer(host=inet_ntoa(ip), port=port)
+            for ip, port in _PEER4.iter_unpack(memoryview(data)[offset:])
+        ]
+    except struct.error:
         raise ValueError("invalid 'peers' list")
-    return peers
 
 
-def unpack_peers6(data: bytes) -> list[Peer]:
-    peers6: list[Peer] = []
+def unpack_peers6(data: bytes, offset: int = 0) -> list[Peer]:
     try:
-        for *ipbytes, port in struct.iter_unpack("!16cH", data):
-            ip = str(IPv6Address(b"".join(ipbytes)))
-            peers6.append(Peer(host=ip, port=port))
-    except (struct.error, AddressValueError):
+        return [
+            Peer(host=inet_ntop(AF_INET6, ip), port=port)
+            for ip, port in _PEER6.iter_unpack(memoryview(data)[offset:])
+        ]
+    except struct.error:
         raise ValueError("invalid 'peers6' list")
-    return peers6
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, ClassVar, Optional, TypeVar, cast
+from typing import TYPE_CHECKING, Any, ClassVar, Optional, TypeVar
 from urllib.parse import quote
 import attr
 from httpx import AsyncClient, HTTPError
@@ -12,7 +12,7 @@ from .base import (
     unpack_peers6,
 )
 from ..bencode import unbencode
-from ..consts import CLIENT, LEFT, NUMWANT
+from ..consts import LEFT, NUMWANT
 from ..errors import TrackerError, TrackerFailure, UnbencodeError
 from ..peer import Peer
 from ..util import TRACE, InfoHash, get_string, get_typed_value, log
@@ -23,15 +23,26 @@ if TYPE_CHECKING:
 T = TypeVar("T")
 
 
+@attr.define(slots=False)
 class HTTPTracker(Tracker):
     SCHEMES: ClassVar[list[str]] = ["http", "https"]
 
+    #: The tracker URL, minus any fragment, followed by the character with
+    #: which to append announce parameters to its query string
+    target_prefix: str = attr.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        url = self.url.with_fragment(None)
+        self.target_prefix = f"{url}&" if url.query_string else f"{url}?"
+
     async def connect(self, app: Demagnetizer) -> HTTPTrackerSession:
-        return HTTPTrackerSession(
-            tracker=self,
-            app=app,
-            client=AsyncClient(follow_redirects=True, headers={"User-Agent": CLIENT}),
-        )
+        if app.http_client is None:
+            # Not inside a `Demagnetizer.http_client_scope()`, so use a client
+            # of our own
+            return HTTPTrackerSession(
+                tracker=self, app=app, client=app.make_http_client(), owns_client=True
+            )
+        return HTTPTrackerSession(tracker=self, app=app, client=app.http_client)
 
 
 @attr.define
@@ -39,9 +50,13 @@ class HTTPTrackerSession(TrackerSession):
     tracker: HTTPTracker
     app: Demagnetizer
     client: AsyncClient
+    #: Whether the client belongs to this session rather than being shared
+    #: via `Demagnetizer.http_client_scope()`
+    owns_client: bool = False
 
     async def aclose(self) -> None:
-        await self.client.aclose()
+        if self.owns_client:
+            await self.client.aclose()
 
     async def announce(
         self,
@@ -54,7 +69,7 @@ class HTTPTrackerSession(TrackerSession):
         # As of v0.22.0, the only way to send a bytes query parameter through
         # httpx is if we do all of the encoding ourselves.
         params = (
-            f"info_hash={quote(bytes(info_hash))}"
+            f"info_hash={quote(info_hash.as_bytes)}"
             f"&peer_id={quote(self.app.peer_id)}"
             f"&port={self.app.peer_port}"
             f"&uploaded={uploaded}"
@@ -66,13 +81,8 @@ class HTTPTrackerSession(TrackerSession):
         )
         if event.http_value:
             params += f"&event={event.http_value}"
-        url = self.tracker.url.with_fragment(None)
-        if url.query_string:
-            target = f"{url}&{params}"
-        else:
-            target = f"{url}?{params}"
         try:
-            r = await self.client.get(target)
+            r = await self.client.get(self.tracker.target_prefix + params)
         except HTTPError as e:
             raise TrackerError(
                 tracker=self.tracker,
@@ -126,37 +136,25 @@ class HTTPAnnounceResponse(AnnounceResponse):
         if (interval := get_typed_value(data, b"interval", int)) is None:
             # Just fill in a reasonable default
             interval = 1800
-        peers: list[Peer] = []
-        if b"peers" in data:
-            if isinstance(data[b"peers"], list):
-                # Original format (BEP 0003)
-                for p in data[b"peers"]:
-                    if not isinstance(p, dict):
-                        raise ValueError("invalid 'peers' list")
-                    try:
-                        ip = cast(bytes, p[b"ip"]).decode("utf-8")
-                    except Exception:
-                        raise ValueError("invalid 'peers' list")
-                    if b"port" in p and isinstance(p[b"port"], int):
-                        port = p[b"port"]
-                    else:
-                        raise ValueError("invalid 'peers' list")
-                    peer_id: Optional[bytes]
-                    if b"peer id" in p and isinstance(p[b"peer id"], bytes):
-                        peer_id = p[b"peer id"]
-                    else:
-                        peer_id = None
-                    peers.append(Peer(host=ip, port=port, id=peer_id))
-            elif isinstance(data[b"peers"], bytes):
-                # Compact format (BEP 0023)
-                peers.extend(unpack_peers(data[b"peers"]))
-            else:
-                raise ValueError("invalid 'peers' list")
-        if b"peers6" in data:
-            if not isinstance(data[b"peers6"], bytes):
+        # unbencode() only ever produces exact `bytes` & `list` instances, so
+        # compare types directly, checking for the far more common compact
+        # format first.
+        peers: list[Peer]
+        if type(pv := data.get(b"peers")) is bytes:
+            # Compact format (BEP 0023)
+            peers = unpack_peers(pv)
+        elif type(pv) is list:
+            # Original format (BEP 0003)
+            peers = [peer_from_dict(p) for p in pv]
+        elif pv is None:
+            peers = []
+        else:
+            raise ValueError("invalid 'peers' list")
+        if (pv6 := data.get(b"peers6")) is not None:
+            if type(pv6) is not bytes:
                 raise ValueError("invalid 'peers6' list")
             # Compact format (BEP 0007)
-            peers.extend(unpack_peers6(data[b"peers6"]))
+            peers.extend(unpack_peers6(pv6))
         return cls(
             interval=interval,
             peers=peers,
@@ -166,3 +164,17 @@ class HTTPAnnounceResponse(AnnounceResponse):
             complete=get_typed_value(data, b"complete", int),
             incomplete=get_typed_value(data, b"incomplete", int),
         )
+
+
+def peer_from_dict(p: Any) -> Peer:
+    if not isinstance(p, dict):
+        raise ValueError("invalid 'peers' list")
+    if not isinstance(ip := p.get(b"ip"), bytes):
+        raise ValueError("invalid 'peers' list")
+    if not isinstance(port := p.get(b"port"), int):
+        raise ValueError("invalid 'peers' list")
+    try:
+        host = ip.decode("utf-8")
+    except UnicodeDecodeError:
+        raise ValueError("invalid 'peers' list")
+    return Peer(host=host, port=port, id=get_typed_value(p, b"peer id", bytes))
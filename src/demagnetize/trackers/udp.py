@@ -1,14 +1,12 @@
 # <https://www.bittorrent.org/beps/bep_0015.html>
 from __future__ import annotations
 from collections.abc import Callable
-from contextlib import AbstractContextManager, nullcontext
 from functools import partial
-from random import randint
+import os
 from socket import AF_INET6
 import struct
-from time import time
-from typing import TYPE_CHECKING, Any, ClassVar, Optional, TypeVar
-from anyio import create_connected_udp_socket, fail_after
+from typing import TYPE_CHECKING, ClassVar, Optional, TypeVar
+from anyio import create_connected_udp_socket, current_time, fail_after
 from anyio.abc import ConnectedUDPSocket, SocketAttribute
 import attr
 from .base import (
@@ -19,7 +17,7 @@ from .base import (
     unpack_peers,
     unpack_peers6,
 )
-from ..consts import LEFT, NUMWANT
+from ..consts import LEFT, NUMWANT, UDP_INITIAL_RTT, UDP_MIN_TIMEOUT
 from ..errors import TrackerFailure
 from ..util import TRACE, InfoHash, Key, log
 
@@ -30,6 +28,13 @@ T = TypeVar("T")
 
 PROTOCOL_ID = 0x41727101980
 
+_CONN_REQ = struct.Struct("!qii")
+_CONN_RESP = struct.Struct("!iiq")
+#: The first four bytes of an error response (action 3)
+_ERR_ACTION = (3).to_bytes(4, "big")
+_ANN_REQ = struct.Struct("!qii20s20sqqqi4s4siH")
+_ANN_RESP_HDR = struct.Struct("!iiiii")
+
 
 @attr.define(slots=False)
 class UDPTracker(Tracker):
@@ -60,10 +65,24 @@ class UDPTrackerSession(TrackerSession):
     app: Demagnetizer
     socket: ConnectedUDPSocket
     connection: Optional[Connection] = None
+    #: Smoothed estimate of the round-trip time to the tracker, in seconds
+    rtt: float = UDP_INITIAL_RTT
+    is_ipv6: bool = attr.field(init=False)
 
-    @property
-    def is_ipv6(self) -> bool:
-        return self.socket.extra(SocketAttribute.family) == AF_INET6
+    def __attrs_post_init__(self) -> None:
+        self.is_ipv6 = self.socket.extra(SocketAttribute.family) == AF_INET6
+
+    def retry_timeout(self, n: int) -> float:
+        # Base the first two waits on the observed round-trip time so that a
+        # lost packet to a healthy tracker is resent quickly, then fall back
+        # to BEP 15's schedule of 15 * 2^n seconds.
+        if n < 2:
+            return max(UDP_MIN_TIMEOUT, 3 * self.rtt) * (1 << n)
+        else:
+            return 15 << (n - 2)
+
+    def update_rtt(self, sample: float) -> None:
+        self.rtt += (sample - self.rtt) / 8
 
     async def aclose(self) -> None:
         await self.socket.aclose()
@@ -115,47 +134,54 @@ class UDPTrackerSession(TrackerSession):
         response_parser: Callable[[bytes], T],
         expiration: Optional[float] = None,
     ) -> T:
-        ctx: AbstractContextManager[Any]
-        if expiration is None:
-            ctx = nullcontext()
-        else:
-            ctx = fail_after(expiration - time())
-        try:
-            with ctx:
-                n = 0
-                while True:
-                    await self.socket.send(msg)
-                    try:
-                        with fail_after(15 << n):
-                            resp = await self.socket.receive()
-                    except TimeoutError:
-                        log.log(
-                            TRACE,
-                            "%s did not reply in time; resending message",
-                            self.tracker,
-                        )
-                        if n < 8:
-                            ### TODO: Should this count remember timeouts from
-                            ### previous connections & connection attempts?
-                            n += 1
-                        continue
-                    try:
-                        data = response_parser(resp)
-                    except TrackerFailure:
-                        raise
-                    except Exception as e:
-                        log.log(TRACE, "Bad response from %s: %r", self.tracker, resp)
-                        log.log(
-                            TRACE,
-                            "Response from %s was invalid, will resend: %s: %s",
-                            self.tracker,
-                            type(e).__name__,
-                            e,
-                        )
-                        continue
-                    return data
-        except TimeoutError:
-            raise ConnectionTimeoutError
+        n = 0
+        resent = False
+        while True:
+            timeout = self.retry_timeout(n)
+            if expiration is not None:
+                remaining = expiration - current_time()
+                if remaining <= 0:
+                    raise ConnectionTimeoutError
+                timeout = min(timeout, remaining)
+            sent_at = current_time()
+            await self.socket.send(msg)
+            try:
+                with fail_after(timeout):
+                    resp = await self.socket.receive()
+            except TimeoutError:
+                if expiration is not None and current_time() >= expiration:
+                    raise ConnectionTimeoutError
+                log.log(
+                    TRACE,
+                    "%s did not reply in time; resending message",
+                    self.tracker,
+                )
+                if n < 10:
+                    ### TODO: Should this count remember timeouts from previous
+                    ### connections & connection attempts?
+                    n += 1
+                resent = True
+                continue
+            try:
+                data = response_parser(resp)
+            except TrackerFailure:
+                raise
+            except Exception as e:
+                log.log(TRACE, "Bad response from %s: %r", self.tracker, resp)
+                log.log(
+                    TRACE,
+                    "Response from %s was invalid, will resend: %s: %s",
+                    self.tracker,
+                    type(e).__name__,
+                    e,
+                )
+                resent = True
+                continue
+            if not resent:
+                # Replies to resent messages are ambiguous as to which
+                # transmission they answer, so don't sample them
+                self.update_rtt(current_time() - sent_at)
+            return data
 
 
 @attr.define
@@ -165,7 +191,7 @@ class Connection:
     expiration: float = attr.field(init=False)
 
     def __attrs_post_init__(self) -> None:
-        self.expiration = time() + 60
+        self.expiration = current_time() + 60
 
     async def announce(
         self,
@@ -191,15 +217,14 @@ class Connection:
             left=left,
             urldata=urldata,
         )
-        return await self.session.send_receive(
-            msg,
-            partial(
-                parse_announce_response,
-                transaction_id,
-                is_ipv6=self.session.is_ipv6,
-            ),
-            expiration=self.expiration,
-        )
+        is_ipv6 = self.session.is_ipv6
+
+        # A closure is cheaper to call than a partial with keyword arguments,
+        # which has to merge its stored keywords on every call.
+        def parser(resp: bytes) -> UDPAnnounceResponse:
+            return parse_announce_response(transaction_id, resp, is_ipv6=is_ipv6)
+
+        return await self.session.send_receive(msg, parser, expiration=self.expiration)
 
 
 class ConnectionTimeoutError(Exception):
@@ -213,17 +238,19 @@ class UDPAnnounceResponse(AnnounceResponse):
 
 
 def make_transaction_id() -> int:
-    return randint(-(1 << 31), (1 << 31) - 1)
+    return int.from_bytes(os.urandom(4), "big", signed=True)
 
 
 def build_connection_request(transaction_id: int) -> bytes:
-    return struct.pack("!qii", PROTOCOL_ID, 0, transaction_id)
+    return _CONN_REQ.pack(PROTOCOL_ID, 0, transaction_id)
 
 
 def raise_error_response(resp: bytes) -> None:
-    action, _ = struct.unpack_from("!ii", resp)
+    # Error responses are detected by their raw action bytes so that the
+    # header of a normal response only needs to be unpacked once, by its own
+    # parser.
     ### TODO: Should we ever care about checking the transaction ID?
-    if action == 3:
+    if resp.startswith(_ERR_ACTION) and len(resp) >= 8:
         msg = resp[8:].decode("utf-8", "replace")
         raise TrackerFailure(msg)
 
@@ -231,8 +258,8 @@ def raise_error_response(resp: bytes) -> None:
 def parse_connection_response(transaction_id: int, resp: bytes) -> int:
     # Returns connection ID or raises error
     raise_error_response(resp)
-    action, xaction_id, connection_id = struct.unpack_from("!iiq", resp)
-    # Use `struct.unpack_from()` instead of `unpack()` because "Clients ...
+    action, xaction_id, connection_id = _CONN_RESP.unpack_from(resp)
+    # Use `unpack_from()` instead of `unpack()` because "Clients ...
     # should not assume packets to be of a certain size"
     if xaction_id != transaction_id:
         raise ValueError(
@@ -259,21 +286,27 @@ def build_announce_request(
     urldata: str,
     numwant: int = NUMWANT,
 ) -> bytes:
+    # The "20s" format NUL-pads `peer_id` if it's shorter than 20 bytes
     ip_address = b"\0\0\0\0"
-    bs = (
-        struct.pack("!qii", connection_id, 1, transaction_id)
-        + bytes(info_hash)
-        + (peer_id + b"\0" * 20)[:20]
-        + struct.pack("!qqqi", downloaded, left, uploaded, event.udp_value)
-        + ip_address
-        + bytes(key)
-        + struct.pack("!iH", numwant, peer_port)
+    bs = _ANN_REQ.pack(
+        connection_id,
+        1,
+        transaction_id,
+        info_hash.as_bytes,
+        peer_id,
+        downloaded,
+        left,
+        uploaded,
+        event.udp_value,
+        ip_address,
+        key.as_bytes,
+        numwant,
+        peer_port,
     )
     # BEP 41
-    ud = urldata.encode("utf-8")
-    while ud:
-        segment = ud[:255]
-        ud = ud[255:]
+    ud = memoryview(urldata.encode("utf-8"))
+    for i in range(0, len(ud), 255):
+        segment = ud[i : i + 255]
         bs += bytes([0x02, len(segment)]) + segment
     return bs
 
@@ -282,19 +315,17 @@ def parse_announce_response(
     transaction_id: int, resp: bytes, is_ipv6: bool
 ) -> UDPAnnounceResponse:
     raise_error_response(resp)
-    header = struct.Struct("!iiiii")
-    action, xaction_id, interval, leechers, seeders = header.unpack_from(resp)
+    action, xaction_id, interval, leechers, seeders = _ANN_RESP_HDR.unpack_from(resp)
     if xaction_id != transaction_id:
         raise ValueError(
             f"Transaction ID mismatch: expected {transaction_id}, got {xaction_id}"
         )
     if action != 1:
         raise ValueError(f"Action mismatch: expected 1, got {action}")
-    resp = resp[header.size :]
     if is_ipv6:
-        peers = unpack_peers6(resp)
+        peers = unpack_peers6(resp, _ANN_RESP_HDR.size)
     else:
-        peers = unpack_peers(resp)
+        peers = unpack_peers(resp, _ANN_RESP_HDR.size)
     return UDPAnnounceResponse(
         interval=interval, leechers=leechers, seeders=seeders, peers=peers
     )
@@ -4,12 +4,11 @@ from collections.abc import AsyncIterator, Awaitable, Iterable, Iterator
 from contextlib import AsyncExitStack, asynccontextmanager
 from hashlib import sha1
 import logging
-from random import choices, randrange
+from random import choices, getrandbits
 import re
 from string import ascii_letters, digits
 from typing import Any, Optional, TypeVar, cast
 from anyio import CapacityLimiter, create_memory_object_stream, create_task_group
-from anyio.streams.memory import MemoryObjectSendStream
 import attr
 from torf import Magnet, Torrent
 from .consts import INFO_CHUNK_SIZE, PEER_ID_PREFIX
@@ -20,6 +19,11 @@ TRACE = 5
 
 T = TypeVar("T")
 
+_WS_RE = re.compile(r"\s")
+_SANITIZE_TABLE = str.maketrans(
+    {c: "_" for c in [*range(0x20), *map(ord, '\\/<>:|"?*')]}
+)
+
 
 @attr.define
 class InfoHash:
@@ -56,10 +60,14 @@ class InfoHash:
 @attr.define
 class Key:
     value: int
+    as_bytes: bytes = attr.field(init=False, eq=False, repr=False)
+
+    def __attrs_post_init__(self) -> None:
+        self.as_bytes = self.value.to_bytes(4, "big")
 
     @classmethod
     def generate(cls) -> Key:
-        return cls(randrange(1 << 32))
+        return cls(getrandbits(32))
 
     def __int__(self) -> int:
         return self.value
@@ -68,7 +76,7 @@ class Key:
         return f"{self.value:08x}"
 
     def __bytes__(self) -> bytes:
-        return self.value.to_bytes(4, "big")
+        return self.as_bytes
 
 
 @attr.define
@@ -123,13 +131,14 @@ def template_torrent_filename(fntemplate: str, torrent: Torrent) -> str:
 
 
 def sanitize_pathname(s: str) -> str:
-    return re.sub(r'[\0-\x1F\x5C/<>:|"?*]', "_", re.sub(r"\s", " ", s))
+    return _WS_RE.sub(" ", s).translate(_SANITIZE_TABLE)
 
 
 def make_peer_id() -> bytes:
     s = PEER_ID_PREFIX.encode("utf-8")[:20]
     if len(s) < 20:
         s += "".join(choices(ascii_letters + digits, k=20 - len(s))).encode("us-ascii")
+    assert len(s) == 20
     return s
 
 
@@ -137,19 +146,24 @@ def make_peer_id() -> bytes:
 async def acollect(
     coros: Iterable[Awaitable[T]], limit: Optional[CapacityLimiter] = None
 ) -> AsyncIterator[AsyncIterator[T]]:
-    async def pipe(coro: Awaitable[T], sndr: MemoryObjectSendStream[T]) -> None:
+    # All tasks share a single sender, which is closed once the inner task
+    # group has finished, rather than each task getting its own clone.
+    sender, receiver = create_memory_object_stream[T]()
+
+    async def pipe(coro: Awaitable[T]) -> None:
         async with AsyncExitStack() as stack:
             if limit is not None:
                 await stack.enter_async_context(limit)
-            await stack.enter_async_context(sndr)
             value = await coro
-            await sndr.send(value)
+            await sender.send(value)
 
-    async with create_task_group() as tg:
-        sender, receiver = create_memory_object_stream[T]()
-        async with sender:
+    async def run_all() -> None:
+        async with sender, create_task_group() as tg:
             for c in coros:
-                tg.start_soon(pipe, c, sender.clone())
+                tg.start_soon(pipe, c)
+
+    async with create_task_group() as tg:
+        tg.start_soon(run_all)
         async with receiver:
             yield receiver
 
@@ -157,12 +171,15 @@ async def acollect(
 @attr.define
 class InfoPiecer:
     total_size: int
-    data: bytearray = attr.Factory(bytearray)
+    data: bytearray = attr.field(init=False)
     sizes: list[int] = attr.field(init=False)
     index: int = 0
+    #: Number of bytes of `data` that have been filled in so far
+    offset: int = attr.field(init=False, default=0)
     digest: Any = attr.Factory(sha1)
 
     def __attrs_post_init__(self) -> None:
+        self.data = bytearray(self.total_size)
         qty, residue = divmod(self.total_size, INFO_CHUNK_SIZE)
         self.sizes = [INFO_CHUNK_SIZE] * qty
         if residue:
@@ -181,12 +198,14 @@ class InfoPiecer:
                 f"Piece {self.index} is wrong length: expected {expected_len}"
                 f" bytes, got {len(blob)}"
             )
-        self.data.extend(blob)
+        end = self.offset + expected_len
+        self.data[self.offset : end] = blob
         self.digest.update(blob)
+        self.offset = end
         self.index += 1
 
     def get_data(self) -> bytes:
-        return bytes(self.data)
+        return bytes(memoryview(self.data)[: self.offset])
 
     def get_digest(self) -> str:
         return cast(str, self.digest.hexdigest())
@@ -36,6 +36,8 @@ def test_bencode(blob: bytes, data: Any) -> None:
     "blob",
     [
         b"i-0e",
+        b"i-e",
+        b"-:",
         b"i00e",
         b"i04e",
         b"04:spam",
@@ -1,6 +1,23 @@
+from __future__ import annotations
+from anyio import (
+    Event,
+    IncompleteRead,
+    create_task_group,
+    create_tcp_listener,
+    sleep,
+)
+from anyio.abc import SocketAttribute, SocketStream
+from anyio.streams.buffered import BufferedByteReceiveStream
+from httpx import AsyncClient
 import pytest
+from yarl import URL
+from demagnetize.bencode import bencode
+from demagnetize.consts import HTTP_CONNECTION_LIMIT
+from demagnetize.core import Demagnetizer
 from demagnetize.peer import Peer
-from demagnetize.trackers.http import HTTPAnnounceResponse
+from demagnetize.trackers.base import AnnounceEvent
+from demagnetize.trackers.http import HTTPAnnounceResponse, HTTPTracker
+from demagnetize.util import InfoHash
 
 
 @pytest.mark.parametrize(
@@ -107,3 +124,103 @@ def test_parse_response(blob: bytes, obj: HTTPAnnounceResponse) -> None:
 def test_parse_bad_response(blob: bytes) -> None:
     with pytest.raises(ValueError):
         HTTPAnnounceResponse.parse(blob)
+
+
+@pytest.mark.anyio
+async def test_http_client_scope_nested() -> None:
+    app = Demagnetizer()
+    async with app.http_client_scope() as client:
+        async with app.http_client_scope() as inner_client:
+            assert inner_client is client
+        assert not inner_client.is_closed
+    assert app.http_client is None
+    assert client.is_closed
+
+
+@pytest.mark.anyio
+async def test_http_client_scope_concurrent() -> None:
+    app = Demagnetizer()
+    clients: list[AsyncClient] = []
+    first_entered = Event()
+    second_entered = Event()
+    first_exited = Event()
+
+    async def first() -> None:
+        async with app.http_client_scope() as client:
+            clients.append(client)
+            first_entered.set()
+            await second_entered.wait()
+        first_exited.set()
+
+    async def second() -> None:
+        await first_entered.wait()
+        async with app.http_client_scope() as client:
+            clients.append(client)
+            second_entered.set()
+            await first_exited.wait()
+            assert app.http_client is client
+            assert not client.is_closed
+
+    async with create_task_group() as tg:
+        tg.start_soon(first)
+        tg.start_soon(second)
+    assert clients[0] is clients[1]
+    assert clients[0].is_closed
+    assert app.http_client is None
+
+
+@pytest.mark.anyio
+async def test_connect_outside_http_client_scope() -> None:
+    app = Demagnetizer()
+    tracker = HTTPTracker(url=URL("http://tracker.example.com/announce"))
+    async with await tracker.connect(app) as session:
+        assert session.owns_client
+    assert session.client.is_closed
+    async with app.http_client_scope() as client:
+        async with await tracker.connect(app) as session:
+            assert session.client is client
+            assert not session.owns_client
+        assert not client.is_closed
+
+
+@pytest.mark.anyio
+async def test_announce_more_than_connection_limit() -> None:
+    body = bencode({b"interval": 1800, b"peers": b"\x7f\x00\x00\x01\x1a\xe1"})
+    response = b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%b" % (len(body), body)
+
+    async def serve(stream: SocketStream) -> None:
+        # Answer every request on the connection after a short delay so that
+        # the client's connection pool fills up
+        reader = BufferedByteReceiveStream(stream)
+        async with stream:
+            while True:
+                try:
+                    await reader.receive_until(b"\r\n\r\n", 65536)
+                except IncompleteRead:
+                    return
+                await sleep(0.05)
+                await stream.send(response)
+
+    app = Demagnetizer()
+    info_hash = InfoHash.from_string("4c3e215f9e50b06d708a74c9b0e66e08bce520aa")
+    responses: list[HTTPAnnounceResponse] = []
+    async with await create_tcp_listener(local_host="127.0.0.1") as listener:
+        port = listener.extra(SocketAttribute.local_port)
+        tracker = HTTPTracker(url=URL(f"http://127.0.0.1:{port}/announce"))
+
+        async def announce() -> None:
+            async with await tracker.connect(app) as session:
+                responses.append(
+                    await session.announce(info_hash, AnnounceEvent.STARTED)
+                )
+
+        async with create_task_group() as tg:
+            tg.start_soon(listener.serve, serve)
+            async with app.http_client_scope() as client:
+                assert client.timeout.pool is None
+                async with create_task_group() as announcers:
+                    for _ in range(HTTP_CONNECTION_LIMIT + 50):
+                        announcers.start_soon(announce)
+            tg.cancel_scope.cancel()
+    assert len(responses) == HTTP_CONNECTION_LIMIT + 50
+    assert all(r.peers == [Peer("127.0.0.1", 6881)] for r in responses)
@@ -1,6 +1,14 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Optional, cast
+from anyio import create_memory_object_stream
+from anyio.abc import SocketStream
+from anyio.streams.stapled import StapledObjectStream
 import pytest
+from demagnetize.consts import MAX_INFO_SIZE
+from demagnetize.core import Demagnetizer
+from demagnetize.errors import PeerError
+from demagnetize.peer import Peer
+from demagnetize.peer.core import PeerConnection, get_metadata_info
 from demagnetize.peer.extensions import (
     BEP9MsgType,
     BEP10Extension,
@@ -9,7 +17,10 @@ from demagnetize.peer.extensions import (
     extbit,
 )
 from demagnetize.peer.messages import (
+    MESSAGE_TYPES,
     BEP9Message,
+    Choke,
+    EmptyMessage,
     Extended,
     ExtendedHandshake,
     Handshake,
@@ -131,6 +142,15 @@ def test_message(blob: bytes, msg: Message) -> None:
     assert bytes(msg) == blob
 
 
+def test_message_duplicate_type() -> None:
+    with pytest.raises(ValueError):
+
+        class DuplicateChoke(EmptyMessage):
+            TYPE = 0
+
+    assert MESSAGE_TYPES[0] is Choke
+
+
 @pytest.mark.parametrize(
     "payload,handshake,extensions,extension_names,client,metadata_size",
     [
@@ -244,3 +264,26 @@ def test_bep9_message(ext: Extended, b9msg: BEP9Message, msg_id: int) -> None:
     extensions = BEP10Registry.from_dict({BEP10Extension.METADATA: msg_id})
     assert ext.decompose(extensions) == b9msg
     assert b9msg.to_extended(extensions) == ext
+
+
+@pytest.mark.parametrize("metadata_size", [-5, 0, MAX_INFO_SIZE + 1, 1 << 40])
+@pytest.mark.anyio
+async def test_get_metadata_info_bad_size(metadata_size: int) -> None:
+    send, receive = create_memory_object_stream[bytes](1)
+    handshake = ExtendedHandshake.make(
+        extensions=BEP10Registry.from_dict({BEP10Extension.METADATA: 3}),
+        metadata_size=metadata_size,
+    )
+    await send.send(bytes(handshake.to_extended()))
+    conn = PeerConnection(
+        peer=Peer("127.0.0.1", 60069),
+        app=Demagnetizer(),
+        socket=cast(SocketStream, StapledObjectStream(send, receive)),
+        info_hash=InfoHash.from_string("4c3e215f9e50b06d708a74c9b0e66e08bce520aa"),
+    )
+    async with conn:
+        with pytest.raises(PeerError) as excinfo:
+            await get_metadata_info(conn)
+    assert excinfo.value.msg == (
+        f"Peer declared invalid info size of {metadata_size} bytes"
+    )
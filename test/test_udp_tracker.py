@@ -1,7 +1,18 @@
+from __future__ import annotations
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from anyio import create_task_group, create_udp_socket
+from anyio.abc import SocketAttribute, UDPSocket
+import pytest
+from yarl import URL
+from demagnetize.consts import UDP_MIN_TIMEOUT
+from demagnetize.core import Demagnetizer
 from demagnetize.peer import Peer
 from demagnetize.trackers.base import AnnounceEvent
 from demagnetize.trackers.udp import (
     UDPAnnounceResponse,
+    UDPTracker,
+    UDPTrackerSession,
     build_announce_request,
     build_connection_request,
     parse_announce_response,
@@ -72,6 +83,27 @@ def test_build_announce_request_with_urldata() -> None:
     )
 
 
+def test_build_announce_request_with_long_urldata() -> None:
+    urldata = "/announce?" + "x" * 300
+    req = build_announce_request(
+        transaction_id=-1523061017,
+        connection_id=0x5CCBDFDB157C25BA,
+        info_hash=InfoHash.from_string("4c3e215f9e50b06d708a74c9b0e66e08bce520aa"),
+        peer_id=b"-TR3000-12nig788rk3b",
+        peer_port=60069,
+        key=Key(0x2C545EDE),
+        event=AnnounceEvent.STARTED,
+        downloaded=0,
+        uploaded=0,
+        left=(1 << 63) - 1,
+        numwant=80,
+        urldata=urldata,
+    )
+    assert req[98:] == (
+        b"\x02\xff" + urldata[:255].encode() + b"\x02\x37" + urldata[255:].encode()
+    )
+
+
 def test_parse_announce_response() -> None:
     assert parse_announce_response(
         transaction_id=-1523061017,
@@ -135,3 +167,89 @@ def test_parse_announce_response_no_peers() -> None:
             b"\x00\x00\x00\x1a"
         ),
     ) == UDPAnnounceResponse(interval=1800, leechers=2, seeders=26, peers=[])
+
+
+@asynccontextmanager
+async def udp_session() -> AsyncIterator[tuple[UDPTrackerSession, UDPSocket]]:
+    # Yields a session connected to a local socket standing in for the tracker
+    async with await create_udp_socket(local_host="127.0.0.1") as server:
+        port = server.extra(SocketAttribute.local_port)
+        tracker = UDPTracker(url=URL(f"udp://127.0.0.1:{port}/announce"))
+        async with await tracker.connect(Demagnetizer()) as session:
+            yield (session, server)
+
+
+@pytest.mark.anyio
+async def test_retry_timeout() -> None:
+    async with udp_session() as (session, _):
+        # Small RTTs are floored at UDP_MIN_TIMEOUT
+        session.rtt = 0.1
+        assert session.retry_timeout(0) == UDP_MIN_TIMEOUT
+        assert session.retry_timeout(1) == 2 * UDP_MIN_TIMEOUT
+        session.rtt = 2
+        assert session.retry_timeout(0) == 6
+        assert session.retry_timeout(1) == 12
+        # From the third transmission onwards, BEP 15's schedule applies
+        assert session.retry_timeout(2) == 15
+        assert session.retry_timeout(3) == 30
+        assert session.retry_timeout(10) == 15 << 8
+
+
+@pytest.mark.anyio
+async def test_update_rtt() -> None:
+    async with udp_session() as (session, _):
+        session.rtt = 0.5
+        session.update_rtt(1.3)
+        assert session.rtt == pytest.approx(0.6)
+        session.update_rtt(0.6)
+        assert session.rtt == pytest.approx(0.6)
+
+
+class RetryLimitReached(Exception):
+    pass
+
+
+@pytest.mark.anyio
+async def test_send_receive_caps_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    retries: list[int] = []
+
+    def retry_timeout(_self: UDPTrackerSession, n: int) -> float:
+        retries.append(n)
+        if len(retries) > 13:
+            raise RetryLimitReached()
+        return 0.001
+
+    monkeypatch.setattr(UDPTrackerSession, "retry_timeout", retry_timeout)
+    async with udp_session() as (session, _):
+        with pytest.raises(RetryLimitReached):
+            await session.send_receive(b"request", bytes)
+    assert retries == [*range(11), 10, 10, 10]
+
+
+@pytest.mark.anyio
+async def test_send_receive_samples_rtt() -> None:
+    async with udp_session() as (session, server):
+        session.rtt = 5
+        async with create_task_group() as tg:
+            tg.start_soon(session.send_receive, b"request", bytes)
+            _, addr = await server.receive()
+            await server.sendto(b"reply", *addr)
+        assert session.rtt < 5
+
+
+@pytest.mark.anyio
+async def test_send_receive_ignores_rtt_of_resent_messages(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Karn's rule: a reply to a resent message can't be matched to a specific
+    # transmission, so it mustn't be used as an RTT sample.
+    monkeypatch.setattr("demagnetize.trackers.udp.UDP_MIN_TIMEOUT", 0.05)
+    async with udp_session() as (session, server):
+        session.rtt = 0.01
+        async with create_task_group() as tg:
+            tg.start_soon(session.send_receive, b"request", bytes)
+            # Drop the first transmission and answer the second
+            await server.receive()
+            _, addr = await server.receive()
+            await server.sendto(b"reply", *addr)
+        assert session.rtt == 0.01